@@ -2,64 +2,219 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import requests
-from requests.exceptions import RequestException
+import httpx
+import orjson
 import json
 import io
 
 # Configuration
 API_URL = "http://localhost:8000"
 
-def fetch_analysis():
-    response = requests.get(f"{API_URL}/analyze/")
-    
-    if response.status_code == 200:
-        return response.json()
-    else:
-        st.warning("No data available for analysis. Please upload a CSV file.")
-        return None
+# Request timeout in seconds (uploads wait as long as the backend needs)
+API_TIMEOUT = 30.0
+
+# Shared keep-alive connection pool for every API call
+@st.cache_resource
+def http():
+    return httpx.Client(
+        base_url=API_URL,
+        timeout=API_TIMEOUT,
+        limits=httpx.Limits(max_connections=16, max_keepalive_connections=4),
+    )
 
 def check_api_health():
     try:
-        response = requests.get(f"{API_URL}/")
+        response = http().get("/")
         return response.status_code == 200
-    except RequestException:
+    except httpx.HTTPError:
         return False
 
 def create_record(data):
-    response = requests.post(f"{API_URL}/records/", json=data)
+    try:
+        response = http().post("/records/", json=data)
+    except httpx.HTTPError:
+        return None
     return response.json() if response.status_code == 200 else None
 
 def update_record(record_id, data):
-    response = requests.put(f"{API_URL}/records/{record_id}", json=data)
+    try:
+        response = http().put(f"/records/{record_id}", json=data)
+    except httpx.HTTPError:
+        return None
     return response.json() if response.status_code == 200 else None
 
 def delete_record(record_id):
-    response = requests.delete(f"{API_URL}/records/{record_id}")
+    try:
+        response = http().delete(f"/records/{record_id}")
+    except httpx.HTTPError:
+        return False
     return response.status_code == 200
 
-def get_records(page, per_page):
-    response = requests.get(f"{API_URL}/records/", params={"page": page, "per_page": per_page})
+# Transport errors propagate: only those mean the API is down
+def dashboard_state(after_id, per_page):
+    response = http().get("/dashboard-state/", params={"after_id": after_id, "per_page": per_page})
     return response.json() if response.status_code == 200 else None
 
+# After a write, show the user's current records page (one /dashboard-state/ call) so the change is visible
+def show_current_page(cursors):
+    try:
+        state = dashboard_state(cursors[-1], 10)
+    except httpx.HTTPError:
+        return
+    if state and state["records"]["records"]:
+        st.caption(f"Records page {len(cursors)} after the change")
+        st.table(pd.DataFrame(state["records"]["records"]))
+
+# Last analysis payload and its ETag, shared across sessions (the data isn't user-specific)
+@st.cache_resource
+def analysis_store():
+    return {}
+
+# Transport errors propagate so a down backend isn't cached as "no data"
 def analyze_data():
-    response = requests.get(f"{API_URL}/analyze/")
-    print(response)
-    return response.json() if response.status_code == 200 else None
+    store = analysis_store()
+    headers = {"If-None-Match": store["etag"]} if store.get("etag") else {}
+    response = http().get("/analyze/", headers=headers)
+    if response.status_code == 304:
+        return store["data"]
+    if response.status_code != 200:
+        return None
+    store.update(etag=response.headers.get("ETag"), data=orjson.loads(response.content))
+    return store["data"]
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_analysis():
+    return analyze_data()
+
+# Records pagination keeps a stack of keyset cursors; the last one is the current page
+def next_page(cursor):
+    st.session_state["cursors"].append(cursor)
+
+def previous_page():
+    st.session_state["cursors"].pop()
+
+def api_unavailable():
+    st.error("⚠️ Cannot connect to the backend API. Please ensure the FastAPI backend is running.")
+
+# Figures are cached by column and data, so reruns with unchanged stats skip Plotly Express
+FIGURE_CACHE_ENTRIES = 32
+
+@st.cache_data(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+def build_histogram(numeric_col, bins, values):
+    # Use only the first len(hist_values) elements of bin_edges for x
+    return px.bar(
+        x=list(bins[:-1]),  # Use all but the last bin edge
+        y=list(values),
+        labels={"x": numeric_col, "y": "Frequency"},
+        title=f"Histogram of {numeric_col}",
+    )
+
+@st.cache_data(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+def build_bin_pie(numeric_col, values):
+    return px.pie(
+        values=list(values),
+        names=[f"Bin {i+1}" for i in range(len(values))],  # Use the length of histogram_values
+        title=f"{numeric_col} Distribution"
+    )
+
+@st.cache_data(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+def build_value_bar(cat_col, labels, values):
+    return px.bar(x=list(labels), y=list(values), labels={"x": cat_col, "y": "Count"}, title=f"{cat_col} Distribution")
+
+@st.cache_data(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+def build_value_pie(cat_col, labels, values):
+    return px.pie(names=list(labels), values=list(values), title=f"{cat_col} Distribution")
+
+# Each analysis tab is a fragment, so changing its selectbox reruns only that tab
+@st.fragment
+def numeric_tab(analysis_results):
+    st.subheader("Numeric Columns Analysis")
+
+    if not analysis_results.get("numeric_stats"):
+        return
+
+    numeric_col = st.selectbox(
+        "Select numeric column for analysis",
+        list(analysis_results["numeric_stats"].keys())
+    )
+
+    # Display Statistics
+    stats = analysis_results["numeric_stats"][numeric_col]
+    st.write(f"Mean: {stats['mean']}")
+    st.write(f"Median: {stats['median']}")
+    st.write(f"Standard Deviation: {stats['std']}")
+    st.write(f"Min: {stats['min']}")
+    st.write(f"Max: {stats['max']}")
+
+    # 🔹 Histogram for Numeric Column
+    st.subheader(f"Histogram of {numeric_col}")
+    hist_fig = build_histogram(numeric_col, tuple(stats["histogram_bins"]), tuple(stats["histogram_values"]))
+    st.plotly_chart(hist_fig)
+
+    # 🔹 Pie Chart for Numeric Column Distribution
+    st.subheader(f"Pie Chart of {numeric_col}")
+    pie_fig = build_bin_pie(numeric_col, tuple(stats["histogram_values"]))
+    st.plotly_chart(pie_fig)
+
+@st.fragment
+def categorical_tab(analysis_results):
+    st.subheader("Categorical Columns Analysis")
+
+    if not analysis_results.get("categorical_stats"):
+        return
+
+    cat_col = st.selectbox(
+        "Select column for analysis",
+        list(analysis_results["categorical_stats"].keys())
+    )
+
+    if "labels" in analysis_results["categorical_stats"][cat_col]:
+        labels = tuple(analysis_results["categorical_stats"][cat_col]["labels"])
+        values = tuple(analysis_results["categorical_stats"][cat_col]["values"])
+
+        # 🔵 Bar Chart
+        st.subheader(f"Bar Chart of {cat_col}")
+        bar_fig = build_value_bar(cat_col, labels, values)
+        st.plotly_chart(bar_fig)
+
+        # 🟠 Pie Chart
+        st.subheader(f"Pie Chart of {cat_col}")
+        pie_fig = build_value_pie(cat_col, labels, values)
+        st.plotly_chart(pie_fig)
+
+@st.fragment
+def missing_values_tab(analysis_results):
+    st.subheader("Missing Values Analysis")
+    missing_data = pd.DataFrame.from_dict(
+        analysis_results["missing_values"],
+        orient='index',
+        columns=['Missing Count']
+    )
+    st.dataframe(missing_data)
 
 def main():
     st.set_page_config(page_title="Data Analysis Dashboard", layout="wide")
     
     st.title("Data Analysis Dashboard")
-    
-    if not check_api_health():
-        st.error("⚠️ Cannot connect to the backend API. Please ensure the FastAPI backend is running.")
-        return
 
     # Sidebar navigation
     page = st.sidebar.selectbox("Navigation", ["Data Management", "Data Analysis"])
 
     if page == "Data Management":
+        # Widget values from session state let the records page double as the health check
+        crud_operation = st.session_state.get("crud_operation", "View Records")
+        cursors = st.session_state.setdefault("cursors", [0])
+        if crud_operation == "View Records":
+            try:
+                state = dashboard_state(cursors[-1], 10)
+            except httpx.HTTPError:
+                api_unavailable()
+                return
+            records = state["records"] if state else None
+        elif not check_api_health():
+            api_unavailable()
+            return
+
         st.header("Data Management")
         
         # File upload section
@@ -71,23 +226,36 @@ def main():
             # Send the file correctly formatted
             files = {"file": ("uploaded.csv", file_bytes, "text/csv")}
 
-            response = requests.post(f"{API_URL}/upload-csv/", files=files)
-
-            if response.status_code == 200:
-                st.success("File uploaded successfully!")
+            try:
+                response = http().post("/upload-csv/", files=files, timeout=None)
+            except httpx.HTTPError as e:
+                st.error(f"Error uploading file: {e}")
             else:
-                st.error(f"Error uploading file: {response.text}")  # Print full error response
+                if response.status_code == 200:
+                    load_analysis.clear()
+                    st.success("File uploaded successfully!")
+                    # The page fetched above predates the upload
+                    if crud_operation == "View Records":
+                        try:
+                            state = dashboard_state(cursors[-1], 10)
+                        except httpx.HTTPError:
+                            state = None
+                        records = state["records"] if state else None
+                else:
+                    st.error(f"Error uploading file: {response.text}")  # Print full error response
                 
         # CRUD Operations
-        crud_operation = st.selectbox("Select Operation", ["View Records", "Add Record", "Edit Record", "Delete Record"])
+        crud_operation = st.selectbox("Select Operation", ["View Records", "Add Record", "Edit Record", "Delete Record"], key="crud_operation")
 
         if crud_operation == "View Records":
-            page_number = st.number_input("Page", min_value=1, value=1)
-            records = get_records(page_number, 10)
-            
             if records:
-                st.write(f"Showing page {records['page']} of {records['total_pages']}")
+                st.write(f"Showing page {len(cursors)} of {records['total_pages']}")
                 st.table(pd.DataFrame(records['records']))
+
+                prev_col, next_col = st.columns(2)
+                prev_col.button("Previous", on_click=previous_page, disabled=len(cursors) == 1)
+                next_col.button("Next", on_click=next_page, args=(records["next_cursor"],),
+                                disabled=records["next_cursor"] is None)
             else:
                 st.warning("No records found")
 
@@ -108,7 +276,9 @@ def main():
                         "experience": experience
                     }
                     if create_record(record):
+                        load_analysis.clear()
                         st.success("Record added successfully!")
+                        show_current_page(cursors)
                     else:
                         st.error("Error adding record")
 
@@ -130,7 +300,9 @@ def main():
                     if experience: update_data["experience"] = experience
                     
                     if update_record(record_id, update_data):
+                        load_analysis.clear()
                         st.success("Record updated successfully!")
+                        show_current_page(cursors)
                     else:
                         st.error("Error updating record")
 
@@ -138,15 +310,25 @@ def main():
             record_id = st.number_input("Enter Record ID to Delete", min_value=0)
             if st.button("Delete Record"):
                 if delete_record(record_id):
+                    load_analysis.clear()
                     st.success("Record deleted successfully!")
+                    show_current_page(cursors)
                 else:
                     st.error("Error deleting record")
 
     else:  # Data Analysis page
+        # A cached analysis needs no round trip; a fetch failure means the API is down
+        try:
+            analysis_results = load_analysis()
+        except httpx.HTTPError:
+            api_unavailable()
+            return
+
         st.header("Data Analysis")
         
-        analysis_results = analyze_data()
         if not analysis_results:
+            # Don't keep "no data" for the TTL; the next visit should ask the API again
+            load_analysis.clear()
             st.warning("No data available for analysis. Please upload a CSV file first.")
             return
 
@@ -163,75 +345,13 @@ def main():
         
 
         with tab1:
-            st.subheader("Numeric Columns Analysis")
-
-            if analysis_results.get("numeric_stats"):
-                numeric_col = st.selectbox(
-                    "Select numeric column for analysis",
-                    list(analysis_results["numeric_stats"].keys())
-                )
-
-        # Display Statistics
-        stats = analysis_results["numeric_stats"][numeric_col]
-        st.write(f"Mean: {stats['mean']}")
-        st.write(f"Median: {stats['median']}")
-        st.write(f"Standard Deviation: {stats['std']}")
-        st.write(f"Min: {stats['min']}")
-        st.write(f"Max: {stats['max']}")
-
-            # 🔹 Histogram for Numeric Column
-        st.subheader(f"Histogram of {numeric_col}")
-        # Use only the first len(hist_values) elements of bin_edges for x
-        hist_fig = px.bar(
-            x=stats["histogram_bins"][:-1],  # Use all but the last bin edge
-            y=stats["histogram_values"],
-            labels={"x": numeric_col, "y": "Frequency"},
-            title=f"Histogram of {numeric_col}",
-        )
-        st.plotly_chart(hist_fig)
-
-        # 🔹 Pie Chart for Numeric Column Distribution
-        st.subheader(f"Pie Chart of {numeric_col}")
-        pie_fig = px.pie(
-            values=stats["histogram_values"],
-            names=[f"Bin {i+1}" for i in range(len(stats["histogram_values"]))],  # Use the length of histogram_values
-            title=f"{numeric_col} Distribution"
-        )
-        st.plotly_chart(pie_fig)
-  
+            numeric_tab(analysis_results)
 
         with tab2:
-            st.subheader("Categorical Columns Analysis")
-    
-            if analysis_results.get("categorical_stats"):
-                cat_col = st.selectbox(
-                    "Select column for analysis",
-                    list(analysis_results["categorical_stats"].keys())
-                )
-
-        if "labels" in analysis_results["categorical_stats"][cat_col]:
-            labels = analysis_results["categorical_stats"][cat_col]["labels"]
-            values = analysis_results["categorical_stats"][cat_col]["values"]
-
-            # 🔵 Bar Chart
-            st.subheader(f"Bar Chart of {cat_col}")
-            bar_fig = px.bar(x=labels, y=values, labels={"x": cat_col, "y": "Count"}, title=f"{cat_col} Distribution")
-            st.plotly_chart(bar_fig)
-
-            # 🟠 Pie Chart
-            st.subheader(f"Pie Chart of {cat_col}")
-            pie_fig = px.pie(names=labels, values=values, title=f"{cat_col} Distribution")
-            st.plotly_chart(pie_fig)
-
+            categorical_tab(analysis_results)
 
         with tab3:
-            st.subheader("Missing Values Analysis")
-            missing_data = pd.DataFrame.from_dict(
-                analysis_results["missing_values"],
-                orient='index',
-                columns=['Missing Count']
-            )
-            st.dataframe(missing_data)
+            missing_values_tab(analysis_results)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -5,4 +5,7 @@ import os
 load_dotenv()
 
 # Database configuration
-DATABASE_URL = f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
\ No newline at end of file
+DATABASE_URL = f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
+
+# Redis configuration (response cache)
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
\ No newline at end of file
@@ -1,22 +1,91 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime
+from itertools import repeat
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from fastapi.responses import ORJSONResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.redis import RedisBackend
+from fastapi_cache.coder import Coder
+from fastapi_cache.decorator import cache
+from redis import asyncio as aioredis
+from sqlalchemy import select, func, cast, distinct, text, Integer, Float, String
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 import pandas as pd
-import io
 import logging
+import tempfile
+import orjson
 import models
 import schemas
-from models import get_db, Record
-
-# Create database tables
-models.create_tables()
-db=get_db()
+from config import REDIS_URL
+from models import get_db, SessionLocal, Record, RecordStats
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Data Analysis API")
+# CSV uploads are spooled to disk and parsed in batches
+UPLOAD_CHUNK_BYTES = 1 << 20
+CSV_CHUNK_ROWS = 10_000
+
+# CSV header -> records column
+CSV_COLUMNS = {
+    "Name": "name",
+    "Age": "age",
+    "Salary": "salary",
+    "Department": "department",
+    "Experience": "experience",
+}
+
+# The upload schema is fixed, so pandas doesn't need to infer column types
+CSV_DTYPES = {
+    "Name": str,
+    "Age": "int32",
+    "Salary": "float64",
+    "Department": str,
+    "Experience": "int32",
+}
+
+# Below this many rows an exact COUNT(*) is cheap enough to run
+EXACT_COUNT_THRESHOLD = 10_000
+
+# Seconds a cached /analyze/ or /records/ response stays in Redis
+CACHE_EXPIRE = 60
+
+# Cache entries are (de)serialized with orjson so numpy arrays and datetimes round-trip
+class ORJSONCoder(Coder):
+    @classmethod
+    def encode(cls, value):
+        return orjson.dumps(value, default=jsonable_encoder, option=orjson.OPT_SERIALIZE_NUMPY)
+
+    @classmethod
+    def decode(cls, value):
+        return orjson.loads(value)
+
+async def invalidate_cache(*namespaces):
+    for namespace in namespaces:
+        try:
+            await FastAPICache.clear(namespace=namespace)
+        except Exception as e:
+            logger.warning(f"Error clearing cache namespace {namespace}: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create database tables
+    await models.create_tables()
+    redis = aioredis.from_url(REDIS_URL)
+    FastAPICache.init(RedisBackend(redis), prefix="eda", coder=ORJSONCoder)
+    refresher = asyncio.create_task(stats_refresher())
+    schedule_stats_refresh()
+    yield
+    refresher.cancel()
+    await redis.close()
+    await models.engine.dispose()
+
+app = FastAPI(title="Data Analysis API", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -34,34 +103,59 @@ async def health_check():
 @app.post("/upload-csv/")
 async def upload_csv(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)  # Add the database dependency
+    db: AsyncSession = Depends(get_db)  # Add the database dependency
 ):
     try:
-        # Read file content
-        contents = await file.read()
-        df = pd.read_csv(io.BytesIO(contents))
-
-        # Insert data into PostgreSQL
-        records = []
-        for _, row in df.iterrows():
-            record = Record(
-                name=row["Name"],
-                age=int(row["Age"]),
-                salary=float(row["Salary"]),
-                department=row["Department"],
-                experience=int(row["Experience"]),
-            )
-            records.append(record)
+        with tempfile.NamedTemporaryFile(suffix=".csv") as tmp:
+            # Stream the upload to disk so memory use doesn't grow with file size
+            while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+                tmp.write(chunk)
+            tmp.flush()
+
+            # Bulk load through asyncpg's binary COPY on the session's connection
+            conn = await db.connection()
+            raw_conn = await conn.get_raw_connection()
+            driver_conn = raw_conn.driver_connection
+            copy_columns = [*CSV_COLUMNS.values(), "created_at", "updated_at"]
 
-        # Use the db session from the dependency
-        db.add_all(records)
-        db.commit()
+            rows_processed = 0
+            columns = []
+            async with driver_conn.transaction():
+                chunks = pd.read_csv(
+                    tmp.name,
+                    engine="c",
+                    usecols=list(CSV_COLUMNS),
+                    dtype=CSV_DTYPES,
+                    chunksize=CSV_CHUNK_ROWS,
+                )
+                for df in chunks:
+                    columns = df.columns.tolist()
+                    df = df.rename(columns=CSV_COLUMNS)[list(CSV_COLUMNS.values())]
+                    # Blank cells parse as float nan: COPY rejects it for text and keeps it as NaN for float8; store NULL
+                    nullable_columns = ["name", "salary", "department"]
+                    df[nullable_columns] = df[nullable_columns].astype(object).where(df[nullable_columns].notna(), None)
 
-        logger.info(f"File uploaded successfully with {len(df)} rows")
+                    # Series.tolist() yields native Python scalars in one C call per column
+                    now = datetime.utcnow()
+                    await driver_conn.copy_records_to_table(
+                        Record.__tablename__,
+                        records=zip(*(df[col].tolist() for col in df.columns), repeat(now), repeat(now)),
+                        columns=copy_columns,
+                    )
+                    rows_processed += len(df)
+
+        await invalidate_cache("records")
+        try:
+            # Rebuild the stats before responding so the dashboard's next read sees the upload
+            await refresh_stats()
+        except Exception as e:
+            logger.error(f"Error refreshing analysis stats: {e}")
+            schedule_stats_refresh()
+        logger.info(f"File uploaded successfully with {rows_processed} rows")
         return {
             "message": "File uploaded successfully!", 
-            "rows_processed": len(df),
-            "columns": df.columns.tolist()
+            "rows_processed": rows_processed,
+            "columns": columns
         }
     except Exception as e:
         logger.error(f"Error in file upload: {str(e)}")
@@ -71,109 +165,314 @@ async def upload_csv(
         )
     
 
-@app.get("/records/")
-async def get_records(page: int = 1, per_page: int = 10, db: Session = Depends(get_db)):
-    records = db.query(Record).offset((page - 1) * per_page).limit(per_page).all()
-    total_records = db.query(Record).count()
+# Planner estimate of the records row count, exact for small tables
+async def approx_count(db: AsyncSession):
+    estimate = await db.scalar(
+        text("SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:table AS regclass)"),
+        {"table": Record.__tablename__},
+    )
+    if estimate is None or estimate < EXACT_COUNT_THRESHOLD:
+        return await db.scalar(select(func.count()).select_from(Record))
+    return estimate
+
+@cache(expire=CACHE_EXPIRE, namespace="records")
+async def list_records(after_id: int, per_page: int):
+    # Keyset pagination: seek past the cursor on the primary key instead of OFFSET
+    async with SessionLocal() as db:
+        result = await db.execute(
+            select(*Record.__table__.c).where(Record.id > after_id).order_by(Record.id).limit(per_page)
+        )
+        # Plain row mappings: no ORM instances to build or validate per row
+        records = [dict(row) for row in result.mappings()]
+        total_records = await approx_count(db)
 
     return {
         "records": records,
         "total": total_records,
-        "page": page,
+        "after_id": after_id,
+        "next_cursor": records[-1]["id"] if len(records) == per_page else None,
         "total_pages": (total_records + per_page - 1) // per_page
     }
 
+@app.get("/records/", response_class=ORJSONResponse)
+async def get_records(after_id: int = 0, per_page: int = 10):
+    return ORJSONResponse(await list_records(after_id, per_page))
+
 @app.post("/records/")
-async def create_record(record: schemas.RecordCreate, db: Session = Depends(get_db)):
+async def create_record(record: schemas.RecordCreate, db: AsyncSession = Depends(get_db)):
     db_record = Record(**record.dict())
     db.add(db_record)
-    db.commit()
-    db.refresh(db_record)
+    await db.commit()
+    await db.refresh(db_record)
+    await invalidate_cache("records")
+    schedule_stats_refresh()
     return db_record
 
 @app.put("/records/{record_id}")
-async def update_record(record_id: int, record: schemas.RecordUpdate, db: Session = Depends(get_db)):
-    db_record = db.query(Record).filter(Record.id == record_id).first()
+async def update_record(record_id: int, record: schemas.RecordUpdate, db: AsyncSession = Depends(get_db)):
+    db_record = await db.get(Record, record_id)
     if not db_record:
         raise HTTPException(status_code=404, detail="Record not found")
 
     for key, value in record.dict(exclude_unset=True).items():
         setattr(db_record, key, value)
 
-    db.commit()
-    db.refresh(db_record)
+    await db.commit()
+    await db.refresh(db_record)
+    await invalidate_cache("records")
+    schedule_stats_refresh()
     return db_record
 
 @app.delete("/records/{record_id}")
-async def delete_record(record_id: int, db: Session = Depends(get_db)):
-    db_record = db.query(Record).filter(Record.id == record_id).first()
+async def delete_record(record_id: int, db: AsyncSession = Depends(get_db)):
+    db_record = await db.get(Record, record_id)
     if not db_record:
         raise HTTPException(status_code=404, detail="Record not found")
 
-    db.delete(db_record)
-    db.commit()
+    await db.delete(db_record)
+    await db.commit()
+    await invalidate_cache("records")
+    schedule_stats_refresh()
     return {"message": "Record deleted successfully"}
 
 from models import engine
 import numpy as np
 
 
-@app.get("/analyze/")
-async def analyze_data():
-    query = "SELECT * FROM records"
-    
-    try:
-        # Execute the query and load the data into a DataFrame
-        df = pd.read_sql_query(query, engine)
-    except Exception as e:
-        logger.error(f"Error querying the database: {e}")
-        raise HTTPException(status_code=500, detail="Database query failed")
+HISTOGRAM_BINS = 10
+TOP_VALUES = 10
+# Writes arriving within this window share one stats refresh
+STATS_REFRESH_DELAY = 0.5
+# Longest a stats read waits for a pending refresh before serving the stored row
+STATS_WAIT_TIMEOUT = 30
+
+stats_refresh_queue = asyncio.Queue()
+stats_refresh_lock = asyncio.Lock()
+# Set when no refresh is pending, so reads don't return stats from before a write
+stats_fresh = asyncio.Event()
+stats_fresh.set()
+
+# Compute the dashboard statistics inside PostgreSQL so only aggregates cross the wire
+async def compute_analysis(conn):
+    table = Record.__table__
+    columns = list(table.columns)
+    numeric_columns = [col for col in columns if isinstance(col.type, (Integer, Float))]
+    categorical_columns = [col for col in columns if col not in numeric_columns]
+    # PostgreSQL aggregates treat a float NaN as a value; count it as missing, as pandas did
+    values = {
+        col.name: func.nullif(col, float("nan")) if isinstance(col.type, Float) else col
+        for col in columns
+    }
 
-    numeric_columns = df.select_dtypes(include=[np.number]).columns
-    categorical_columns = df.select_dtypes(exclude=[np.number]).columns
+    # One scan for row counts, missing values, moments and distinct counts
+    aggregates = [func.count().label("total_rows")]
+    for col in columns:
+        aggregates.append((func.count() - func.count(values[col.name])).label(f"{col.name}_missing"))
+    for col in numeric_columns:
+        value = values[col.name]
+        aggregates += [
+            cast(func.avg(value), Float).label(f"{col.name}_mean"),
+            func.percentile_cont(0.5).within_group(value).label(f"{col.name}_median"),
+            cast(func.stddev(value), Float).label(f"{col.name}_std"),
+            cast(func.min(value), Float).label(f"{col.name}_min"),
+            cast(func.max(value), Float).label(f"{col.name}_max"),
+        ]
+    for col in categorical_columns:
+        aggregates.append(func.count(distinct(col)).label(f"{col.name}_unique"))
+
+    summary = (await conn.execute(select(*aggregates).select_from(table))).mappings().one()
+    if summary["total_rows"] == 0:
+        return None
 
     stats = {
         "basic_info": {
-            "total_rows": int(len(df)),
-            "total_columns": int(len(df.columns)),
-            "numeric_columns": int(len(numeric_columns)),
-            "categorical_columns": int(len(categorical_columns)),
-            "columns": list(df.columns)
+            "total_rows": summary["total_rows"],
+            "total_columns": len(columns),
+            "numeric_columns": len(numeric_columns),
+            "categorical_columns": len(categorical_columns),
+            "columns": [col.name for col in columns]
         },
-        "column_types": {col: str(df[col].dtype) for col in df.columns},
-        "missing_values": {col: int(val) for col, val in df.isnull().sum().items()},
+        "column_types": {col.name: str(col.type) for col in columns},
+        "missing_values": {col.name: summary[f"{col.name}_missing"] for col in columns},
         "numeric_stats": {},
         "categorical_stats": {}
     }
 
-    # Handle numeric columns
-    if len(numeric_columns) > 0:
-        for col in numeric_columns:
-            hist_values, bin_edges = np.histogram(df[col].dropna(), bins=10)
-            stats["numeric_stats"][col] = {
-                "mean": float(df[col].mean()),
-                "median": float(df[col].median()),
-                "std": float(df[col].std()),
-                "min": float(df[col].min()),
-                "max": float(df[col].max()),
-                "histogram_bins": [float(x) for x in bin_edges],
-                "histogram_values": [int(x) for x in hist_values]
-            }
-
-    # Handle categorical columns
-    if len(categorical_columns) > 0:
-        for col in categorical_columns:
-            value_counts = df[col].value_counts().head(10)
-            stats["categorical_stats"][col] = {
-                "value_counts": {str(k): int(v) for k, v in value_counts.items()},
-                "unique_values": int(df[col].nunique()),
-                "labels": [str(x) for x in value_counts.index],
-                "values": [int(x) for x in value_counts.values]
-            }
-
-    logger.info(f"Analysis completed: {stats['basic_info']}")
+    # Handle numeric columns: bucket in SQL with the same edges np.histogram would use
+    bin_edges = {}
+    buckets = []
+    for col in numeric_columns:
+        low, high = summary[f"{col.name}_min"], summary[f"{col.name}_max"]
+        if low is None:
+            # No values: same edges np.histogram gives an empty array, all counts zero
+            bin_edges[col.name] = np.linspace(0.0, 1.0, HISTOGRAM_BINS + 1)
+            continue
+        if low == high:
+            low, high = low - 0.5, high + 0.5
+        bin_edges[col.name] = np.linspace(low, high, HISTOGRAM_BINS + 1)
+        buckets.append(
+            func.least(func.width_bucket(cast(values[col.name], Float), low, high, HISTOGRAM_BINS), HISTOGRAM_BINS).label(col.name)
+        )
+
+    # One scan for every histogram: each grouping set counts the buckets of one column
+    hist_values = {col.name: [0] * HISTOGRAM_BINS for col in numeric_columns}
+    if buckets:
+        bucketed = select(*buckets).subquery()
+        result = await conn.execute(
+            select(*bucketed.c, func.count()).group_by(func.grouping_sets(*bucketed.c))
+        )
+        for *indexes, count in result:
+            for name, index in zip(bucketed.c.keys(), indexes):
+                if index is not None:
+                    hist_values[name][index - 1] = count
+
+    for col in numeric_columns:
+        stats["numeric_stats"][col.name] = {
+            "mean": summary[f"{col.name}_mean"],
+            "median": summary[f"{col.name}_median"],
+            "std": summary[f"{col.name}_std"],
+            "min": summary[f"{col.name}_min"],
+            "max": summary[f"{col.name}_max"],
+            "histogram_bins": bin_edges[col.name],
+            "histogram_values": hist_values[col.name]
+        }
+
+    # Handle categorical columns: one scan, one grouping set per column, top values ranked per set
+    value_counts = {col.name: {} for col in categorical_columns}
+    if categorical_columns:
+        values = select(*(cast(col, String).label(col.name) for col in categorical_columns)).subquery()
+        frequency = func.count()
+        ranked = (
+            select(
+                *values.c,
+                frequency.label("frequency"),
+                func.row_number().over(partition_by=func.grouping(*values.c), order_by=frequency.desc()).label("rank"),
+            )
+            .group_by(func.grouping_sets(*values.c))
+            .having(func.coalesce(*values.c).is_not(None))
+            .subquery()
+        )
+        result = await conn.execute(
+            select(*(ranked.c[name] for name in value_counts), ranked.c.frequency)
+            .where(ranked.c.rank <= TOP_VALUES)
+            .order_by(ranked.c.rank)
+        )
+        for *column_values, count in result:
+            for name, value in zip(value_counts, column_values):
+                if value is not None:
+                    value_counts[name][value] = count
+
+    for col in categorical_columns:
+        stats["categorical_stats"][col.name] = {
+            "value_counts": value_counts[col.name],
+            "unique_values": summary[f"{col.name}_unique"],
+            "labels": list(value_counts[col.name].keys()),
+            "values": list(value_counts[col.name].values())
+        }
+
     return stats
 
+# Weak validator for the analysis: changes whenever a row is added, edited or removed
+async def analysis_etag(conn):
+    result = await conn.execute(select(func.max(Record.updated_at), func.count()).select_from(Record))
+    last_updated, total = result.one()
+    return f'W/"{last_updated.isoformat() if last_updated else 0}-{total}"'
+
+# Recompute the analysis and store it in records_stats
+async def refresh_stats():
+    # Serialised, so an older snapshot can never be upserted over a newer one
+    async with stats_refresh_lock:
+        async with engine.begin() as conn:
+            etag = await analysis_etag(conn)
+            payload = await compute_analysis(conn)
+            stmt = insert(RecordStats).values(id=1, etag=etag, payload=payload)
+            await conn.execute(stmt.on_conflict_do_update(
+                index_elements=[RecordStats.id],
+                set_={"etag": etag, "payload": payload, "refreshed_at": datetime.utcnow()},
+            ))
+        await invalidate_cache("analyze")
+    logger.info(f"Analysis stats refreshed: {etag}")
+    return etag, payload
+
+def schedule_stats_refresh():
+    stats_fresh.clear()
+    stats_refresh_queue.put_nowait(None)
+
+# Background task: coalesce queued refresh requests and rebuild the stats once per burst
+async def stats_refresher():
+    while True:
+        await stats_refresh_queue.get()
+        await asyncio.sleep(STATS_REFRESH_DELAY)
+        while not stats_refresh_queue.empty():
+            stats_refresh_queue.get_nowait()
+        try:
+            await refresh_stats()
+        except Exception as e:
+            logger.error(f"Error refreshing analysis stats: {e}")
+        finally:
+            # A write that arrived during the refresh has queued another one
+            if stats_refresh_queue.empty():
+                stats_fresh.set()
+
+@cache(expire=CACHE_EXPIRE, namespace="analyze")
+async def load_stats():
+    async with engine.connect() as conn:
+        result = await conn.execute(select(RecordStats.etag, RecordStats.payload).where(RecordStats.id == 1))
+        row = result.one_or_none()
+    if row is None:
+        # Nothing precomputed yet (first request after startup)
+        return await refresh_stats()
+    return row.etag, row.payload
+
+# Stored stats, once any refresh scheduled by an earlier write has landed
+async def fresh_stats():
+    try:
+        await asyncio.wait_for(stats_fresh.wait(), timeout=STATS_WAIT_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning("Stats refresh still pending; serving the stored analysis")
+    return await load_stats()
+
+@app.head("/analyze/")
+async def analyze_head():
+    try:
+        etag, _ = await fresh_stats()
+    except Exception as e:
+        logger.error(f"Error querying the database: {e}")
+        raise HTTPException(status_code=500, detail="Database query failed")
+    return Response(headers={"ETag": etag})
+
+@app.get("/analyze/", response_class=ORJSONResponse)
+async def analyze_data(request: Request):
+    try:
+        etag, stats = await fresh_stats()
+    except Exception as e:
+        logger.error(f"Error querying the database: {e}")
+        raise HTTPException(status_code=500, detail="Database query failed")
+
+    if request.headers.get("If-None-Match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    if stats is None:
+        raise HTTPException(status_code=404, detail="No data available for analysis")
+
+    return ORJSONResponse(stats, headers={"ETag": etag})
+
+# Health, a page of records and the analysis overview in one round trip for the dashboard
+@app.get("/dashboard-state/", response_class=ORJSONResponse)
+async def dashboard_state(after_id: int = 0, per_page: int = 10):
+    # The overview is optional here: don't wait on a pending refresh or fail the records page over it
+    try:
+        _, stats = await load_stats()
+    except Exception as e:
+        logger.error(f"Error loading analysis stats: {e}")
+        stats = None
+
+    return ORJSONResponse({
+        "health": "ok",
+        "records": await list_records(after_id, per_page),
+        "analysis": stats["basic_info"] if stats else None,
+    })
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")